@@ -1,76 +1,57 @@
 import pandas as pd
+import numpy as np
 import os
 from config import ENTRY_THRESHOLD, EXIT_THRESHOLD, INSTRUMENT
+from io_utils import load_instrument, save_table
 
-def calculate_ibs():
-    # Define input and output paths
-    input_path = os.path.join('data', f'{INSTRUMENT}.csv')
+def compute_ibs(high, low, close):
+    # IBS = (Close - Low) / (High - Low), 0.0 where High == Low or a price is missing.
+    # Two working arrays only: the numerator buffer is divided in place and
+    # becomes the result; the few zero-range (inf/NaN) and missing-price (NaN)
+    # bars are reset afterwards.
+    # An unmasked in-place divide is cheaper than np.divide(..., where=mask).
+    den = np.subtract(high, low)
+    ibs = np.subtract(close, low)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ibs /= den
+    ibs[~np.isfinite(ibs)] = 0.0
+    return ibs
+
+def calculate_ibs(instrument=INSTRUMENT):
+    # Define output paths
     output_dir = 'outputs'
-    output_path = os.path.join(output_dir, 'ibs_indicator.csv')
+    output_path = os.path.join(output_dir, f'{instrument}_ibs_indicator.csv')
 
-    # Check if input file exists
-    if not os.path.exists(input_path):
-        print(f"Error: {input_path} not found.")
+    df = load_instrument(instrument)
+    if df is None:
         return
 
     # Create output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    print(f"Reading data from {input_path}...")
-    df = pd.read_csv(input_path)
-    
-    # Clean column names (remove surrounding whitespace)
-    df.columns = df.columns.str.strip()
-
-    # Ensure required columns exist
-    required_cols = ['High', 'Low', 'Close', 'Open']
-    for col in required_cols:
-        if col not in df.columns:
-            # Try lowercase if title case not found
-            if col.lower() in df.columns:
-                df.rename(columns={col.lower(): col}, inplace=True)
-            else:
-                print(f"Error: Column '{col}' not found in input data.")
-                return
-
-    # Parse datetime if available
-    if 'Date' in df.columns:
-        df['datetime'] = pd.to_datetime(df['Date'], utc=True)
-    elif df.index.name == 'Date':
-        df['datetime'] = pd.to_datetime(df.index, utc=True)
-    else:
-        # Fallback to first column
-        df['datetime'] = pd.to_datetime(df.iloc[:, 0], utc=True)
-
     # Calculate IBS
     # Formula: IBS = (Close - Low) / (High - Low)
-    # Handle division by zero (if High == Low)
-    df['denominator'] = df['High'] - df['Low']
-    
-    # Avoid division by zero by replacing 0 with NaN or a small epsilon, 
-    # but practically if High == Low, IBS is essentially undefined or can be considered 0.5 or 0 depending on interpretation.
-    # Here we will set it to 0.5 (neutral) if range is 0 to avoid errors, or just let pandas handle infs if preferred.
-    # Let's handle it safely.
-    
-    df['ibs_value'] = (df['Close'] - df['Low']) / df['denominator']
-    
-    # Fill NaN/Inf results (where High == Low) with 0.5 or 0
-    df['ibs_value'] = df['ibs_value'].fillna(0.0)
+    # If High == Low the range is zero and IBS is undefined; we treat it as 0.0,
+    # as for bars with a missing price (same rule as the trading system)
+    # Computed on the float64 prices, like the trading system's signals, so the
+    # tags below agree with them on bars close to a threshold
+    high = df['High'].to_numpy()
+    low = df['Low'].to_numpy()
+    close = df['Close'].to_numpy()
 
-    # Determine Tags based on Thresholds
-    # tag = 'entry' if ibs > ENTRY_THRESHOLD
-    # tag = 'exit' if ibs < EXIT_THRESHOLD
-    # else empty string or None
-    def get_tag(ibs):
-        if ibs < ENTRY_THRESHOLD:
-            return 'entry'
-        elif ibs > EXIT_THRESHOLD:
-            return 'exit'
-        else:
-            return None
+    df['ibs_value'] = compute_ibs(high, low, close)
 
-    df['tag'] = df['ibs_value'].apply(get_tag)
+    # Determine Tags based on Thresholds
+    # tag = 'entry' if ibs < ENTRY_THRESHOLD
+    # tag = 'exit' if ibs > EXIT_THRESHOLD
+    # else None
+    # Stored as a categorical (int8 codes, -1 = no tag) rather than a column of strings
+    v = df['ibs_value'].to_numpy()
+    codes = np.full(len(v), -1, dtype=np.int8)
+    codes[v < ENTRY_THRESHOLD] = 0
+    codes[v > EXIT_THRESHOLD] = 1
+    df['tag'] = pd.Categorical.from_codes(codes, categories=['entry', 'exit'])
 
     # Select columns for output
     # datetime, open, close, high, low, ibs_value, tag
@@ -84,9 +65,9 @@ def calculate_ibs():
 
     print(f"IBS calculated. Sample:\n{result_df[['datetime', 'ibs_value']].head()}")
 
-    # Save to CSV
-    print(f"Saving to {output_path}...")
-    result_df.to_csv(output_path, index=False)
+    # Save to CSV (or Parquet, see OUTPUT_FORMAT)
+    output_path = save_table(result_df, output_path)
+    print(f"Saved to {output_path}")
     print("Done.")
 
 if __name__ == "__main__":
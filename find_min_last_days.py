@@ -1,41 +1,61 @@
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
 import os
 import sys
 from config import MIN_LAST_DAYS, INSTRUMENT
+from io_utils import load_instrument, save_table
+from plotting import MAX_CANDLES, build_price_figure, save_chart
 
 # Force UTF-8 for Windows console
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
 
-def find_and_plot_min_last_days():
-    # Load data
-    file_path = os.path.join('data', f'{INSTRUMENT}.csv')
-    if not os.path.exists(file_path):
-        print(f"Error: {file_path} not found.")
-        return
+def rolling_min(values, window):
+    # Rolling minimum over the last `window` values (current one included),
+    # NaN until the window is full - same output as Series.rolling(window).min().
+    # Van Herk/Gil-Werman: split the series into blocks of `window` values and
+    # take a running min forwards and backwards inside each block. Any window
+    # spans at most two blocks, so its min is min(suffix[start], prefix[end]).
+    # O(N) regardless of window length, with no Python-level loop.
+    # Integer/bool input is promoted to float so the warm-up rows can hold NaN.
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        values = values.astype(np.result_type(values.dtype, np.float32))
+    n = len(values)
+    out = np.full(n, np.nan, dtype=values.dtype)
+    if window < 1 or n < window:
+        return out
 
-    print(f"Reading data from {file_path}...")
-    df = pd.read_csv(file_path, skipinitialspace=True)
-    df.columns = df.columns.str.strip()
-    
-    # Process date
-    if 'Date' in df.columns:
-        df['datetime'] = pd.to_datetime(df['Date'], utc=True)
-    elif df.index.name == 'Date':
-        df['datetime'] = pd.to_datetime(df.index, utc=True)
-    else:
-        df['datetime'] = pd.to_datetime(df.iloc[:, 0], utc=True)
+    # Full blocks are processed as a 2-D view of the input and the shorter tail
+    # block on its own, accumulating straight into the prefix/suffix buffers
+    # (no padded copy of the series, no per-block temporaries).
+    n_full = n - n % window
+    prefix = np.empty_like(values)
+    suffix = np.empty_like(values)
+
+    blocks = values[:n_full].reshape(-1, window)
+    np.minimum.accumulate(blocks, axis=1, out=prefix[:n_full].reshape(-1, window))
+    np.minimum.accumulate(blocks[:, ::-1], axis=1, out=suffix[:n_full].reshape(-1, window)[:, ::-1])
+
+    tail = values[n_full:]
+    np.minimum.accumulate(tail, out=prefix[n_full:])
+    np.minimum.accumulate(tail[::-1], out=suffix[n_full:][::-1])
+
+    np.minimum(suffix[:n - window + 1], prefix[window - 1:], out=out[window - 1:])
+    return out
+
+def find_and_plot_min_last_days(instrument=INSTRUMENT, plot=True):
+    df = load_instrument(instrument)
+    if df is None:
+        return
     
-    # Create index for x-axis
-    df = df.reset_index(drop=True)
-    df['index'] = df.index
+    # Bar positions used as x-axis (skips weekend gaps); one array shared by all traces
+    x = np.arange(len(df), dtype=np.int32)
 
     # Calculate Min Last Days
-    # Rolling minimum of 'Low'
-    df['min_last_days'] = df['Low'].rolling(window=MIN_LAST_DAYS).min()
+    # Rolling minimum of 'Low', on the same float64 prices the trading system uses,
+    # so Low == min_last_days holds exactly on the bars that set the minimum
+    df['min_last_days'] = rolling_min(df['Low'].to_numpy(), MIN_LAST_DAYS)
 
     print(f"Calculated Minimum of last {MIN_LAST_DAYS} days.")
     print(df[['datetime', 'Low', 'min_last_days']].tail())
@@ -46,89 +66,45 @@ def find_and_plot_min_last_days():
     if not os.path.exists(outputs_dir):
         os.makedirs(outputs_dir)
         
-    output_csv_path = os.path.join(outputs_dir, 'min_last_days.csv')
+    output_path = os.path.join(outputs_dir, f'{instrument}_min_last_days.csv')
     df_output = df[['datetime', 'Low', 'min_last_days']].copy()
-    df_output.to_csv(output_csv_path, index=False)
-    print(f"Datos guardados exitosamente en: {output_csv_path}")
+    output_path = save_table(df_output, output_path)
+    print(f"Datos guardados exitosamente en: {output_path}")
 
-    # Create figure
-    fig = make_subplots(
-        rows=1, cols=1,
-        shared_xaxes=True,
-        vertical_spacing=0.03
-    )
+    if not plot:
+        return
 
-    # Add Price trace (Candlestick)
-    trace_price = go.Candlestick(
-        x=df['index'],
-        open=df['Open'],
-        high=df['High'],
-        low=df['Low'],
-        close=df['Close'],
-        name=INSTRUMENT,
-        increasing=dict(line=dict(color='green')),
-        decreasing=dict(line=dict(color='red')),
-        opacity=0.9
-    )
-    fig.add_trace(trace_price, row=1, col=1)
-
-    # Add Min Last Days Line
-    trace_min = go.Scatter(
-        x=df['index'],
-        y=df['min_last_days'],
-        mode='lines',
-        name=f'Min Last {MIN_LAST_DAYS} Days',
-        line=dict(color='blue', width=2),
-        hovertemplate='<b>Min Last Days</b>: %{y:.2f}<extra></extra>'
-    )
-    fig.add_trace(trace_min, row=1, col=1)
-
-    # Configure layout
-    fig.update_layout(
-        title=f'{INSTRUMENT} Close Price with Min Last {MIN_LAST_DAYS} Days',
-        template='plotly_white',
-        hovermode='closest',
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font=dict(family="Arial", size=12, color="#333333"),
-        showlegend=True,
-        height=900,
-        xaxis_rangeslider_visible=False
-    )
+    # Keep only the arrays the chart needs and release the DataFrames before plotting
+    open_ = df['Open'].to_numpy(dtype=np.float32)
+    high = df['High'].to_numpy(dtype=np.float32)
+    low = df['Low'].to_numpy(dtype=np.float32)
+    close = df['Close'].to_numpy(dtype=np.float32)
+    min_last_days = df['min_last_days'].to_numpy()
+    datetimes = df['datetime'].to_numpy()
 
-    # Configure x-axis ticks
-    num_ticks = 30
-    tick_indices = [int(i) for i in range(0, len(df), max(1, len(df)//num_ticks))]
-    tick_vals = df.iloc[tick_indices]['index']
-    tick_text = df.iloc[tick_indices]['datetime'].dt.strftime('%Y-%m-%d')
-
-    fig.update_xaxes(
-        tickmode='array', tickvals=tick_vals, ticktext=tick_text,
-        tickangle=-45, showgrid=False,
-        showline=True, linewidth=1, linecolor='#d3d3d3',
-        row=1, col=1
-    )
+    del df, df_output
 
-    fig.update_yaxes(
-        showgrid=True, gridcolor='#e0e0e0', gridwidth=0.5,
-        showline=True, linewidth=1, linecolor='#d3d3d3',
-        tickcolor='gray', tickfont=dict(color='gray'),
-        tickformat=',',
-        row=1, col=1
+    # Large histories are drawn with aggregated candles so the page does not embed
+    # one candle per bar (this chart has no per-bar markers)
+    fig = build_price_figure(
+        x, open_, high, low, close, min_last_days, datetimes,
+        title=f'{instrument} Close Price with Min Last {MIN_LAST_DAYS} Days',
+        name=instrument,
+        candle_style=dict(
+            increasing=dict(line=dict(color='green')),
+            decreasing=dict(line=dict(color='red'))
+        ),
+        min_line_style=dict(
+            line=dict(color='blue', width=2),
+            hovertemplate='<b>Min Last Days</b>: %{y:.2f}<extra></extra>'
+        ),
+        max_candles=MAX_CANDLES
     )
 
     # Output path
-    charts_dir = 'charts'
-    if not os.path.exists(charts_dir):
-        os.makedirs(charts_dir)
-    
-    output_html = os.path.join(charts_dir, f'{INSTRUMENT}_min_last_days.html')
-    fig.write_html(output_html)
+    output_html = os.path.join('charts', f'{instrument}_min_last_days.html')
+    save_chart(fig, output_html)
     print(f"Gráfico guardado exitosamente en: {output_html}")
-    
-    # Open in browser
-    import webbrowser
-    webbrowser.open(f'file://{os.path.abspath(output_html)}')
 
 if __name__ == "__main__":
     find_and_plot_min_last_days()
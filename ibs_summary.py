@@ -1,19 +1,41 @@
 
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import os
 from config import INSTRUMENT, START_DATE, END_DATE
+from io_utils import table_path, load_table
 
-def generate_summary_report():
-    input_file = os.path.join('outputs', 'trading_record.csv')
-    output_html = os.path.join('charts', 'summary.html')
+# One row of the trade list. Fields: entry date, entry price, exit date, exit price,
+# PnL points, PnL dollars, RESULT, css class ("profit"/"loss")
+TRADE_ROW_TEMPLATE = """
+                <tr>
+                    <td>{0}</td>
+                    <td>{1:.2f}</td>
+                    <td>{2}</td>
+                    <td>{3:.2f}</td>
+                    <td>{4:.2f}</td>
+                    <td class="{7}">${5:,.2f}</td>
+                    <td class="{7}">{6}</td>
+                </tr>
+        """
+
+def generate_summary_report(instrument=INSTRUMENT, plot=True):
+    record_csv = os.path.join('outputs', f'{instrument}_trading_record.csv')
+    input_file = table_path(record_csv)
+    output_html = os.path.join('charts', f'{instrument}_summary.html')
 
     if not os.path.exists(input_file):
         print(f"Error: {input_file} not found.")
         return
 
     # Read data
-    df = pd.read_csv(input_file)
+    # Only the columns used by the report, with numeric dtypes declared up front
+    df = load_table(
+        record_csv,
+        columns=['entry_date', 'entry_price', 'exit_date', 'exit_price', 'pnl_points', 'pnl_dollars', 'result'],
+        dtype={'entry_price': 'float64', 'exit_price': 'float64', 'pnl_points': 'float64', 'pnl_dollars': 'float64'}
+    )
     if df.empty:
         print("No trades found in CSV.")
         return
@@ -44,10 +66,9 @@ def generate_summary_report():
     largest_loser = losers['pnl_dollars'].min() if num_losses > 0 else 0
 
     # Equity Curve & Drawdown
-    df['equity'] = df['pnl_dollars'].cumsum()
-    df['peak'] = df['equity'].cummax()
-    df['drawdown'] = df['equity'] - df['peak']
-    max_drawdown = df['drawdown'].min()
+    equity = np.cumsum(df['pnl_dollars'].to_numpy(dtype=np.float64))
+    drawdown = equity - np.maximum.accumulate(equity)
+    max_drawdown = drawdown.min()
 
     # Ratios
     # Sharpe Ratio (Simplified: using trade returns, usually annualized daily returns are used but we have per-trade)
@@ -71,67 +92,67 @@ def generate_summary_report():
     short_pnl = 0
 
     # --- Plotly Equity Curve ---
-    fig = go.Figure()
+    # Left out of the report (with no Plotly work at all) for batch runs
+    equity_section_html = ''
+    if plot:
+        fig = go.Figure()
     
-    # Area chart for Equity
-    fig.add_trace(go.Scatter(
-        x=list(range(len(df))),
-        y=df['equity'],
-        mode='lines',
-        fill='tozeroy',
-        name='Equity',
-        line=dict(color='#2ecc71', width=2),
-        fillcolor='rgba(46, 204, 113, 0.2)'
-    ))
+        # Area chart for Equity
+        fig.add_trace(go.Scatter(
+            x=list(range(len(df))),
+            y=equity,
+            mode='lines',
+            fill='tozeroy',
+            name='Equity',
+            line=dict(color='#2ecc71', width=2),
+            fillcolor='rgba(46, 204, 113, 0.2)'
+        ))
     
-    fig.update_layout(
-        title='Equity Curve',
-        xaxis_title='Trade Number',
-        yaxis_title='Accumulated Profit ($)',
-        template='plotly_white',
-        height=400,
-        margin=dict(l=40, r=40, t=40, b=40),
-        showlegend=False
-    )
+        fig.update_layout(
+            title='Equity Curve',
+            xaxis_title='Trade Number',
+            yaxis_title='Accumulated Profit ($)',
+            template='plotly_white',
+            height=400,
+            margin=dict(l=40, r=40, t=40, b=40),
+            showlegend=False
+        )
     
-    equity_chart_html = fig.to_html(full_html=False, include_plotlyjs='cdn')
+        equity_chart_html = fig.to_html(full_html=False, include_plotlyjs='cdn', validate=False)
+        equity_section_html = f"""
+        <h2>Equity Curve</h2>
+        <div style="background-color: white; padding: 20px; border-radius: 8px; margin: 20px 0; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+            {equity_chart_html}
+        </div>
+"""
 
     # --- Yearly Analysis ---
     df['year'] = pd.to_datetime(df['entry_date']).dt.year
-    yearly_stats = []
-    
-    unique_years = sorted(df['year'].unique())
-    for year in unique_years:
-        ydf = df[df['year'] == year]
-        y_total_trades = len(ydf)
-        y_winners = ydf[ydf['pnl_dollars'] > 0]
-        y_losers = ydf[ydf['pnl_dollars'] <= 0]
-        
-        y_gross_profit = y_winners['pnl_dollars'].sum()
-        y_gross_loss = y_losers['pnl_dollars'].sum()
-        y_total_pnl = ydf['pnl_dollars'].sum()
-        y_avg_pnl = ydf['pnl_dollars'].mean()
-        
-        y_win_rate = (len(y_winners) / y_total_trades * 100) if y_total_trades > 0 else 0
-        y_profit_factor = abs(y_gross_profit / y_gross_loss) if y_gross_loss != 0 else float('inf')
-        
-        y_std_pnl = ydf['pnl_dollars'].std()
-        y_sharpe = (y_avg_pnl / y_std_pnl) if y_std_pnl and y_std_pnl != 0 else 0
-        
-        y_downside = y_losers['pnl_dollars']
-        y_downside_std = y_downside.std()
-        y_sortino = (y_avg_pnl / y_downside_std) if y_downside_std and y_downside_std != 0 else 0
-        
-        yearly_stats.append({
-            'Year': year,
-            'Total Trades': y_total_trades,
-            'Win Rate': y_win_rate,
-            'Total PnL': y_total_pnl,
-            'Avg PnL': y_avg_pnl,
-            'Profit Factor': y_profit_factor,
-            'Sharpe': y_sharpe,
-            'Sortino': y_sortino
-        })
+    is_win = df['pnl_dollars'] > 0
+    by_year = df.groupby('year')['pnl_dollars']
+    wins_by_year = df[is_win].groupby('year')['pnl_dollars']
+    losses_by_year = df[~is_win].groupby('year')['pnl_dollars']
+
+    # One grouped pass per statistic; years without winners/losers align to NaN
+    yearly = pd.DataFrame({
+        'Total Trades': by_year.size(),
+        'Total PnL': by_year.sum(),
+        'Avg PnL': by_year.mean(),
+        'Std PnL': by_year.std(),
+        'Wins': wins_by_year.size(),
+        'Gross Profit': wins_by_year.sum(),
+        'Gross Loss': losses_by_year.sum(),
+        'Downside Std': losses_by_year.std()
+    })
+    yearly[['Wins', 'Gross Profit', 'Gross Loss']] = yearly[['Wins', 'Gross Profit', 'Gross Loss']].fillna(0)
+
+    yearly['Win Rate'] = yearly['Wins'] / yearly['Total Trades'] * 100
+    yearly['Profit Factor'] = (yearly['Gross Profit'] / yearly['Gross Loss']).abs().where(yearly['Gross Loss'] != 0, float('inf'))
+    # A zero std gives a ratio of 0; an undefined std (single trade) stays NaN
+    yearly['Sharpe'] = (yearly['Avg PnL'] / yearly['Std PnL']).where(yearly['Std PnL'] != 0, 0)
+    yearly['Sortino'] = (yearly['Avg PnL'] / yearly['Downside Std']).where(yearly['Downside Std'] != 0, 0)
+
+    yearly_stats = yearly.rename_axis('Year').reset_index().to_dict('records')
     
     # Generate Yearly HTML Table
     yearly_table_html = """
@@ -151,9 +172,10 @@ def generate_summary_report():
             </thead>
             <tbody>
     """
+    yearly_rows = []
     for stat in yearly_stats:
         pnl_class = "profit" if stat['Total PnL'] > 0 else "loss"
-        yearly_table_html += f"""
+        yearly_rows.append(f"""
                 <tr>
                     <td>{stat['Year']}</td>
                     <td>{stat['Total Trades']}</td>
@@ -164,19 +186,21 @@ def generate_summary_report():
                     <td>{stat['Sharpe']:.2f}</td>
                     <td>{stat['Sortino']:.2f}</td>
                 </tr>
-        """
-    yearly_table_html += """
+        """)
+    yearly_table_html += ''.join(yearly_rows) + """
             </tbody>
         </table>
     """
 
     # --- HTML Generation ---
     
-    html_content = f"""<!DOCTYPE html>
+    # The document is collected as a list of parts and written with a single join
+    html_parts = []
+    html_parts.append(f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
-    <title>IBS Strategy Summary | {INSTRUMENT}</title>
+    <title>IBS Strategy Summary | {instrument}</title>
     <style>
         body {{
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
@@ -278,7 +302,7 @@ def generate_summary_report():
 </head>
 <body>
     <div class="container">
-        <h1>IBS Strategy Summary ({INSTRUMENT})</h1>
+        <h1>IBS Strategy Summary ({instrument})</h1>
         <p><strong>Date Range:</strong> {START_DATE} to {END_DATE}</p>
         <p><strong>Total Trades:</strong> {total_trades}</p>
         
@@ -321,11 +345,7 @@ def generate_summary_report():
             <p>Sortino Ratio (Per Trade): <span class="value">{sortino_ratio:.2f}</span></p>
         </div>
 
-        <h2>Equity Curve</h2>
-        <div style="background-color: white; padding: 20px; border-radius: 8px; margin: 20px 0; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-            {equity_chart_html}
-        </div>
-
+        {equity_section_html}
         {yearly_table_html}
 
         <h2>Trade List</h2>
@@ -342,41 +362,45 @@ def generate_summary_report():
                 </tr>
             </thead>
             <tbody>
-    """
+    """)
     
     # Add Rows
-    for _, row in df.iterrows():
-        pnl_class = "profit" if row['pnl_dollars'] > 0 else "loss"
-        entry_date = row['entry_date'].split(' ')[0] # Simple split
-        exit_date = row['exit_date'].split(' ')[0]
-        html_content += f"""
-                <tr>
-                    <td>{entry_date}</td>
-                    <td>{row['entry_price']:.2f}</td>
-                    <td>{exit_date}</td>
-                    <td>{row['exit_price']:.2f}</td>
-                    <td>{row['pnl_points']:.2f}</td>
-                    <td class="{pnl_class}">${row['pnl_dollars']:,.2f}</td>
-                    <td class="{pnl_class}">{row['result'].upper()}</td>
-                </tr>
-        """
+    # Column order matches the TRADE_ROW_TEMPLATE fields; dates are cut to YYYY-MM-DD
+    # (Parquet timestamps render as strings the same way) and labels/css classes
+    # are built per column, not per row
+    rows_df = pd.DataFrame({
+        'entry_day': df['entry_date'].astype(str).str.slice(0, 10),
+        'entry_price': df['entry_price'],
+        'exit_day': df['exit_date'].astype(str).str.slice(0, 10),
+        'exit_price': df['exit_price'],
+        'pnl_points': df['pnl_points'],
+        'pnl_dollars': df['pnl_dollars'],
+        'result': df['result'].str.upper(),
+        'pnl_class': np.where(df['pnl_dollars'].to_numpy() > 0, 'profit', 'loss')
+    })
+
+    format_row = TRADE_ROW_TEMPLATE.format
+    html_parts.extend(format_row(*row) for row in rows_df.itertuples(index=False, name=None))
 
-    html_content += """
+    html_parts.append("""
             </tbody>
         </table>
     </div>
 </body>
 </html>
-    """
+    """)
 
+    # charts/ may not exist yet when the other charts were skipped (main.py --no-plot)
+    os.makedirs(os.path.dirname(output_html), exist_ok=True)
     with open(output_html, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+        f.write(''.join(html_parts))
     
     print(f"Summary report saved to: {output_html}")
     
-    # Open in browser
-    import webbrowser
-    webbrowser.open(f'file://{os.path.abspath(output_html)}')
+    # Open in browser (not in batch runs)
+    if plot:
+        import webbrowser
+        webbrowser.open(f'file://{os.path.abspath(output_html)}')
 
 if __name__ == "__main__":
     generate_summary_report()
@@ -6,6 +6,8 @@ Download financial data using yfinance.
 
 import yfinance as yf
 import os
+import pandas as pd
+from io_utils import PRICE_COLUMNS, save_instrument_cache
 
 def download_data(symbol, period='1y', start=None, end=None, interval='1d', save_path=None):
     print(f"Downloading data for {symbol}...")
@@ -31,6 +33,12 @@ def download_data(symbol, period='1y', start=None, end=None, interval='1d', save
             os.makedirs(d, exist_ok=True)
         df.to_csv(save_path)
         print(f"Saved {len(df)} rows to {save_path}")
+
+        # Also write the typed bars to the Parquet cache, so the steps that
+        # follow start from it instead of parsing the CSV again
+        bars = df[PRICE_COLUMNS].astype('float64').reset_index(drop=True)
+        bars.insert(0, 'datetime', pd.to_datetime(df.index, utc=True).tz_convert(None))
+        save_instrument_cache(bars, save_path)
         
     return df
 
@@ -0,0 +1,103 @@
+"""
+io_utils.py
+
+Read and write the tables the pipeline hands from one step to the next.
+"""
+
+import os
+import pandas as pd
+from config import OUTPUT_FORMAT
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+def load_instrument(instrument, columns=PRICE_COLUMNS):
+    # Bars for `instrument` as a DataFrame with a 'datetime' column (UTC, stored tz-naive)
+    # plus `columns`.
+    # data/{instrument}.csv is parsed once and cached next to it as Parquet; later calls
+    # read only the requested columns from the cache until the CSV is newer again.
+    # Returns None (after printing why) if the data is missing or incomplete.
+    csv_path = os.path.join('data', f'{instrument}.csv')
+    cache_path = instrument_cache_path(csv_path)
+
+    if not os.path.exists(csv_path):
+        print(f"Error: {csv_path} not found.")
+        return None
+
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(csv_path):
+        print(f"Reading data from {csv_path}...")
+        # The pyarrow parser is multithreaded and already turns the ISO 8601 dates
+        # (with their DST-dependent UTC offsets) into UTC timestamps. Only the UTC
+        # instant is kept, as plain datetime64: no time zone is carried downstream.
+        # Header names may be lowercase/padded, so they are resolved once from the
+        # header row and only the date and price columns are parsed, typed up front.
+        # pyarrow cannot skip the padding of space-padded values (", " separators);
+        # such files, or a missing pyarrow, fall back to the C parser with
+        # skipinitialspace.
+        header = {col.strip().title(): col for col in pd.read_csv(csv_path, nrows=0).columns}
+        missing = [col for col in ['Date'] + PRICE_COLUMNS if col not in header]
+        if missing:
+            print(f"Error: Column(s) {missing} not found in {csv_path}.")
+            return None
+
+        try:
+            df = pd.read_csv(
+                csv_path,
+                engine='pyarrow',
+                usecols=[header[col] for col in ['Date'] + PRICE_COLUMNS],
+                dtype={header[col]: 'float64' for col in PRICE_COLUMNS}
+            )
+        except (ImportError, ValueError):
+            # skipinitialspace also strips the leading padding from the header names
+            df = pd.read_csv(
+                csv_path,
+                skipinitialspace=True,
+                usecols=[header[col].lstrip() for col in ['Date'] + PRICE_COLUMNS],
+                dtype={header[col].lstrip(): 'float64' for col in PRICE_COLUMNS},
+                engine='c'
+            )
+        df.columns = df.columns.str.strip().str.title()
+
+        if isinstance(df['Date'].dtype, pd.DatetimeTZDtype):
+            df['datetime'] = df['Date'].dt.tz_convert(None)
+        else:
+            # utc=True is needed to parse a mix of offsets into one column
+            df['datetime'] = pd.to_datetime(df['Date'], utc=True, format='ISO8601').dt.tz_convert(None)
+        df = save_instrument_cache(df, csv_path)
+        return df[['datetime'] + list(columns)]
+
+    print(f"Reading data from {cache_path}...")
+    df = pd.read_parquet(cache_path, columns=['datetime'] + list(columns))
+    if df['datetime'].dt.tz is not None:
+        # Cache written with UTC-aware timestamps
+        df['datetime'] = df['datetime'].dt.tz_convert(None)
+    return df
+
+def instrument_cache_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def save_instrument_cache(df, csv_path):
+    # Write the bars ('datetime' + PRICE_COLUMNS) as the Parquet cache of `csv_path`
+    df = df[['datetime'] + PRICE_COLUMNS]
+    df.to_parquet(instrument_cache_path(csv_path), index=False)
+    return df
+
+def table_path(csv_path):
+    # Location of a table in the configured OUTPUT_FORMAT ('csv' or 'parquet')
+    if OUTPUT_FORMAT == 'parquet':
+        return os.path.splitext(csv_path)[0] + '.parquet'
+    return csv_path
+
+def save_table(df, csv_path):
+    path = table_path(csv_path)
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+def load_table(csv_path, columns=None, dtype=None):
+    # Parquet keeps column types, so `dtype` only applies to CSV input
+    path = table_path(csv_path)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns, dtype=dtype, engine='c')
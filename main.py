@@ -1,6 +1,9 @@
 import os
 import sys
-from config import INSTRUMENT, START_DATE, END_DATE
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from config import INSTRUMENTS, START_DATE, END_DATE
 
 # Import workflow functions
 from import_data import download_data
@@ -9,36 +12,61 @@ from find_ibs_indicator import calculate_ibs
 from ibs_trading_system import run_ibs_trading_system
 from ibs_summary import generate_summary_report
 
-def main():
-    print("=== Starting Trading Workflow ===\n")
+def run_instrument(instrument, plot=True):
+    # Steps 1-5 for one instrument. Every file it reads or writes is named after
+    # the instrument, so several instruments can run side by side.
+    print(f"=== {instrument} ===\n")
 
     # 1. Download Data
     print("Step 1: Downloading Data...")
-    save_path = os.path.join('data', f'{INSTRUMENT}.csv')
+    save_path = os.path.join('data', f'{instrument}.csv')
     
     # We use start/end dates from config, so set period=None to trigger start/end logic in impot_data
     # Assume interval is '1d' for daily data
     try:
-        download_data(INSTRUMENT, period=None, start=START_DATE, end=END_DATE, interval='1d', save_path=save_path)
+        download_data(instrument, period=None, start=START_DATE, end=END_DATE, interval='1d', save_path=save_path)
     except Exception as e:
         print(f"Error downloading data: {e}")
-        return
+        return False
 
     # 2. Calculate Min Last Days Indicator
     print("\nStep 2: Calculating Min Last Days Indicator...")
-    find_and_plot_min_last_days()
+    find_and_plot_min_last_days(instrument, plot=plot)
 
     # 3. Calculate IBS Indicator
     print("\nStep 3: Calculating IBS Indicator...")
-    calculate_ibs()
+    calculate_ibs(instrument)
 
     # 4. Run IBS Trading System
     print("\nStep 4: Running IBS Trading System...")
-    run_ibs_trading_system()
+    run_ibs_trading_system(instrument, plot=plot)
 
     # 5. Generate Summary Report
     print("\nStep 5: Generating Summary Report...")
-    generate_summary_report()
+    generate_summary_report(instrument, plot=plot)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the IBS trading workflow for the configured instruments.")
+    parser.add_argument('--no-plot', action='store_true',
+                        help="skip all Plotly charts and browser windows (the summary report is written without its equity chart)")
+    args = parser.parse_args()
+    run = partial(run_instrument, plot=not args.no_plot)
+
+    print("=== Starting Trading Workflow ===\n")
+
+    # Instruments are independent, so each one gets its own process
+    # (the work is CPU-bound numpy/pandas/Plotly code, threads would not help)
+    if len(INSTRUMENTS) == 1:
+        completed = [run(INSTRUMENTS[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(INSTRUMENTS), os.cpu_count() or 1)) as executor:
+            completed = list(executor.map(run, INSTRUMENTS))
+
+    if not all(completed):
+        failed = [instrument for instrument, ok in zip(INSTRUMENTS, completed) if not ok]
+        print(f"\n=== Workflow finished with errors for: {', '.join(failed)} ===")
+        return
 
     print("\n=== Workflow Completed Successfully ===")
 
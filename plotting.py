@@ -0,0 +1,286 @@
+"""
+plotting.py
+
+Plotly building blocks shared by the charts of the pipeline.
+"""
+
+import os
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from config import MIN_LAST_DAYS
+
+# Above this many bars the price is not drawn as one SVG candle per bar: charts
+# without per-bar markers aggregate candles (downsample_ohlc), the signal chart
+# switches to a WebGL close line with high/low ranges
+MAX_CANDLES = 5000
+
+def downsample_ohlc(x, open_, high, low, close, max_bars=MAX_CANDLES):
+    # Merge consecutive bars into buckets so that at most `max_bars` candles remain.
+    # Each bucket keeps the first Open, highest High, lowest Low and last Close,
+    # and is placed at the x position of its first bar.
+    n = len(x)
+    if n <= max_bars:
+        return x, open_, high, low, close
+
+    bucket = -(-n // max_bars)  # ceil(n / max_bars)
+    starts = np.arange(0, n, bucket)
+    ends = np.minimum(starts + bucket, n) - 1
+    return (
+        x[starts],
+        open_[starts],
+        np.maximum.reduceat(high, starts),
+        np.minimum.reduceat(low, starts),
+        close[ends]
+    )
+
+def build_price_figure(x, open_, high, low, close, min_last_days, datetimes, title,
+                       name='Prices', candle_style=None, min_line_style=None, max_candles=None,
+                       webgl_above=None):
+    # Candlestick chart of the bars at bar positions `x`, with the min-last-days line,
+    # the shared layout and date ticks. By default every bar gets its own candle.
+    # Above `max_candles` bars the candles are aggregated (see downsample_ohlc);
+    # above `webgl_above` bars the price is a WebGL close line instead, still with
+    # one point per bar so markers added later stay on their bar.
+    if candle_style is None:
+        candle_style = dict(
+            increasing=dict(line=dict(color='grey', width=1), fillcolor='green'),
+            decreasing=dict(line=dict(color='grey', width=1), fillcolor='red')
+        )
+    if min_line_style is None:
+        min_line_style = dict(line=dict(color='blue', width=1), hoverinfo='skip')
+
+    # Create figure
+    fig = make_subplots(
+        rows=1, cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.03
+    )
+
+    # Price Trace
+    n_bars = len(x)
+    if webgl_above is not None and n_bars > webgl_above:
+        # GPU-rendered close line; each bar's High/Low range is an asymmetric error bar
+        print(f"Plotting {n_bars} bars as a WebGL close line with High/Low ranges.")
+        fig.add_trace(go.Scattergl(
+            x=x,
+            y=close,
+            mode='lines',
+            name=name,
+            line=dict(color='grey', width=1),
+            error_y=dict(
+                type='data', symmetric=False,
+                array=high - close, arrayminus=close - low,
+                color='lightgrey', thickness=1, width=0
+            ),
+            hovertemplate='<b>Close</b>: %{y:.2f}<extra></extra>'
+        ), row=1, col=1)
+    else:
+        if max_candles is not None:
+            x_candles, open_, high, low, close = downsample_ohlc(x, open_, high, low, close, max_candles)
+            if len(x_candles) < n_bars:
+                print(f"Plotting {len(x_candles)} aggregated candles for {n_bars} bars.")
+        else:
+            x_candles = x
+
+        fig.add_trace(go.Candlestick(
+            x=x_candles,
+            open=open_,
+            high=high,
+            low=low,
+            close=close,
+            name=name,
+            opacity=0.9,
+            **candle_style
+        ), row=1, col=1)
+
+    # Min Last Days Line
+    fig.add_trace(go.Scatter(
+        x=x,
+        y=min_last_days,
+        mode='lines',
+        name=f'Min Last {MIN_LAST_DAYS} Days',
+        **min_line_style
+    ), row=1, col=1)
+
+    # Layout
+    fig.update_layout(
+        title=title,
+        template='plotly_white',
+        hovermode='closest',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(family="Arial", size=12, color="#333333"),
+        showlegend=True,
+        height=900,
+        xaxis_rangeslider_visible=False
+    )
+
+    # X-Axis styling
+    tick_vals, tick_text = date_ticks(datetimes)
+    style_axes(fig, tick_vals, tick_text)
+    return fig
+
+def build_ibs_figure(df, trades_df=None, title=''):
+    # Price chart with the min-last-days line and the IBS signal dots of `df`
+    # (as prepared by ibs_trading_system.add_signals), plus the trades of
+    # `trades_df` when given.
+
+    # Column arrays used by the signal traces, extracted once
+    idx = df['index'].to_numpy()
+    low = df['Low'].to_numpy()
+    high = df['High'].to_numpy()
+    ibs = df['ibs'].to_numpy()
+
+    # 1-2. Price (one point per bar: the markers below sit on individual bars, so
+    # long histories get the WebGL line rather than aggregated candles) and the
+    # Min Last Days line
+    fig = build_price_figure(
+        idx, df['Open'].to_numpy(), high, low, df['Close'].to_numpy(),
+        df['min_last_days'].to_numpy(), df['datetime'].to_numpy(), title,
+        webgl_above=MAX_CANDLES
+    )
+
+    # 2b. IBS Signals (Raw Dots)
+    # Entry Signals (Green Dot)
+    mask_entry = df['signal_entry'].to_numpy()
+    if mask_entry.any():
+        fig.add_trace(go.Scatter(
+            x=idx[mask_entry],
+            y=low[mask_entry] * 0.995, # Below Low (and below the triangle potentially)
+            mode='markers',
+            name='IBS Condition Met',
+            marker=dict(color='green', size=6, symbol='circle'), # Smaller dot
+            hovertemplate='<b>IBS Entry Signal</b><br>IBS: %{customdata:.2f}<extra></extra>',
+            customdata=ibs[mask_entry]
+        ), row=1, col=1)
+
+    # Exit Signals (Red Dot)
+    mask_exit = df['signal_exit'].to_numpy()
+    if mask_exit.any():
+        fig.add_trace(go.Scatter(
+            x=idx[mask_exit],
+            y=high[mask_exit] * 1.005, # Above High
+            mode='markers',
+            name='IBS Exit Signal',
+            marker=dict(color='red', size=6, symbol='circle'),
+            hovertemplate='<b>IBS Exit Signal</b><br>IBS: %{customdata:.2f}<extra></extra>',
+            customdata=ibs[mask_exit]
+        ), row=1, col=1)
+
+    # 3. Trades (Lines and Markers)
+    # entry_index/exit_index are bar positions, i.e. already x-axis values
+    if trades_df is not None and not trades_df.empty:
+        # Entry Markers
+        trace_entries = go.Scatter(
+            x=trades_df['entry_index'],
+            y=trades_df['entry_price'],
+            mode='markers',
+            name='Trade Entry',
+            marker=dict(
+                symbol='triangle-up',
+                size=10,
+                color='lightgreen',
+                line=dict(width=1, color='darkgreen')
+            ),
+            hovertemplate='<b>Long Entry</b><br>Price: %{y:.2f}<extra></extra>'
+        )
+        fig.add_trace(trace_entries, row=1, col=1)
+
+        # Exit Markers (Win)
+        wins = trades_df[trades_df['result'] == 'win']
+        if not wins.empty:
+            trace_wins = go.Scatter(
+                x=wins['exit_index'],
+                y=wins['exit_price'],
+                mode='markers',
+                name='Exit (Win)',
+                marker=dict(
+                    symbol='square',
+                    size=8,
+                    color='green',
+                    line=dict(width=1, color='darkgreen')
+                ),
+                hovertemplate='<b>Exit (Win)</b><br>PnL: $%{customdata:.2f}<extra></extra>',
+                customdata=wins['pnl_dollars']
+            )
+            fig.add_trace(trace_wins, row=1, col=1)
+
+        # Exit Markers (Loss)
+        losses = trades_df[trades_df['result'] == 'loss']
+        if not losses.empty:
+            trace_losses = go.Scatter(
+                x=losses['exit_index'],
+                y=losses['exit_price'], # Fixed: use actual exit price from trade
+                mode='markers',
+                name='Exit (Loss)',
+                marker=dict(
+                    symbol='square',
+                    size=8,
+                    color='red',
+                    line=dict(width=1, color='darkred')
+                ),
+                hovertemplate='<b>Exit (Loss)</b><br>PnL: $%{customdata:.2f}<extra></extra>',
+                customdata=losses['pnl_dollars']
+            )
+            fig.add_trace(trace_losses, row=1, col=1)
+
+        # Connection Lines
+        # One trace for all trades: entry -> exit segments separated by NaN breaks
+        n_trades = len(trades_df)
+        line_x = np.full(3 * n_trades, np.nan)
+        line_y = np.full(3 * n_trades, np.nan)
+        line_x[0::3] = trades_df['entry_index'].to_numpy()
+        line_x[1::3] = trades_df['exit_index'].to_numpy()
+        line_y[0::3] = trades_df['entry_price'].to_numpy()
+        line_y[1::3] = trades_df['exit_price'].to_numpy()
+
+        fig.add_trace(go.Scatter(
+            x=line_x,
+            y=line_y,
+            mode='lines',
+            line=dict(color='lightgrey', width=1),
+            showlegend=False,
+            hoverinfo='skip'
+        ), row=1, col=1)
+
+    return fig
+
+def date_ticks(datetimes, num_ticks=30):
+    # X-axis ticks for a bar-position axis: evenly spaced positions (first and last
+    # bar included), labelled with numpy's datetime formatting instead of a
+    # per-element strftime
+    n_bars = len(datetimes)
+    tick_vals = np.linspace(0, n_bars - 1, min(num_ticks, n_bars), dtype=np.int64)
+    tick_text = np.datetime_as_string(np.asarray(datetimes, dtype='datetime64[ns]')[tick_vals], unit='D')
+    return tick_vals, tick_text
+
+def style_axes(fig, tick_vals, tick_text):
+    # Date labels on the bar-position x-axis and the light grid used by every chart
+    fig.update_xaxes(
+        tickmode='array', tickvals=tick_vals, ticktext=tick_text,
+        tickangle=-45, showgrid=False,
+        showline=True, linewidth=1, linecolor='#d3d3d3',
+        row=1, col=1
+    )
+
+    fig.update_yaxes(
+        showgrid=True, gridcolor='#e0e0e0', gridwidth=0.5,
+        showline=True, linewidth=1, linecolor='#d3d3d3',
+        tickcolor='gray', tickfont=dict(color='gray'),
+        tickformat=',',
+        row=1, col=1
+    )
+
+def save_chart(fig, output_html):
+    # Write the chart to `output_html` and open it in the browser
+    charts_dir = os.path.dirname(output_html)
+    if charts_dir and not os.path.exists(charts_dir):
+        os.makedirs(charts_dir)
+
+    # Traces were validated when built; load plotly.js from the CDN instead of embedding
+    # it, and never pull in MathJax (no chart uses LaTeX)
+    fig.write_html(output_html, include_plotlyjs='cdn', include_mathjax=False, validate=False)
+
+    import webbrowser
+    webbrowser.open(f'file://{os.path.abspath(output_html)}')